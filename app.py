@@ -2,22 +2,113 @@ import sys
 import os
 sys.path.append('yolov8n')  # Add yolov8n directory to path
 
+# Batasi thread pool CPU sebelum cv2/torch di-import. Inference dikerjakan GPU,
+# CPU hanya untuk decode/resize gambar, jadi thread pool OpenMP/BLAS/OpenCV/PyTorch
+# yang masing-masing sebesar jumlah core hanya saling berebut core
+CPU_THREADS = int(os.environ.get('CPU_THREADS', 2))
+for env_var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(env_var, str(CPU_THREADS))
+
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 import threading
+import queue
 import time
 import uuid
+import hashlib
 from datetime import datetime
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
+import cv2
+import torch
+from PIL import Image
 from detect import YOLODetector  # Import our custom detector
+from job_store import create_job_store
+
+try:
+    import xxhash
+    new_hasher = xxhash.xxh3_128
+except ImportError:
+    # Fallback jika xxhash tidak terinstall
+    def new_hasher():
+        return hashlib.blake2b(digest_size=16)
+
+try:
+    import orjson
+except ImportError:
+    # Fallback ke json stdlib jika orjson tidak terinstall
+    orjson = None
+
+cv2.setNumThreads(1)
+torch.set_num_threads(CPU_THREADS)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    JSON provider Flask menggunakan orjson (serialisasi di C),
+    datetime dan numpy array diserialisasi langsung tanpa konversi manual
+    """
+    
+    @staticmethod
+    def default(o):
+        # Dipakai oleh fallback json stdlib dan untuk tipe yang tidak dikenal orjson
+        if isinstance(o, datetime):
+            return o.isoformat()
+        if hasattr(o, 'tolist'):
+            return o.tolist()
+        return DefaultJSONProvider.default(o)
+    
+    def dumps(self, obj, **kwargs):
+        if orjson is None:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(
+            obj,
+            default=self.default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        ).decode()
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Konfigurasi
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+MAX_UPLOAD_SIZE = 16 * 1024 * 1024  # 16 MB
+UPLOAD_CHUNK_SIZE = 64 * 1024  # 64 KiB per chunk saat streaming ke disk
 
-# Dictionary untuk menyimpan hasil deteksi
-detection_jobs = {}
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE
+
+# Jumlah gambar maksimum per batch inference
+MAX_BATCH = 8
+
+# Sisi terpanjang gambar yang diterima (sama dengan imgsz inference),
+# gambar lebih besar di-resize di server sebelum masuk queue
+MAX_IMAGE_SIZE = 640
+
+# Penyimpanan hasil deteksi: Redis jika REDIS_URL di-set, selain itu di memory
+REDIS_URL = os.environ.get('REDIS_URL')
+job_store = create_job_store(REDIS_URL)
+
+# Event per job untuk memberi tahu bahwa deteksi selesai (lokal per proses)
+job_events = {}
+
+# Waktu tunggu maksimum long-poll /api/result (detik)
+MAX_RESULT_WAIT = 10
+
+# Jumlah long-poll yang boleh menunggu bersamaan. Harus lebih kecil dari `threads`
+# di gunicorn_conf.py agar selalu ada thread tersisa untuk upload dan /health;
+# request di atas batas ini langsung dijawab dengan status saat itu
+MAX_LONG_POLLS = 4
+long_poll_slots = threading.BoundedSemaphore(MAX_LONG_POLLS)
+
+# Pagination untuk /api/jobs
+DEFAULT_JOBS_LIMIT = 100
+MAX_JOBS_LIMIT = 1000
+
+# Queue job deteksi: (image, job_id, filename, conf_threshold, cache_key)
+# Dibatasi karena tiap item memegang gambar yang sudah di-decode (~1.2 MB untuk 640x640),
+# upload saat queue penuh dijawab 503
+MAX_QUEUE_SIZE = MAX_BATCH * 8
+detection_queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
 
 # Buat folder uploads jika belum ada
 if not os.path.exists(UPLOAD_FOLDER):
@@ -26,70 +117,309 @@ if not os.path.exists(UPLOAD_FOLDER):
 
 # Initialize YOLOv8 Detector
 print(f"[{datetime.now()}] Menginisialisasi YOLOv8 Detector...")
-detector = YOLODetector("yolov8n/hasil_traning_botol_kaleng/botol_kaleng_model2/weights/best.pt")
+detector = YOLODetector(
+    "yolov8n/hasil_traning_botol_kaleng/botol_kaleng_model2/weights/best.pt",
+    max_batch=MAX_BATCH
+)
 
 def allowed_file(filename):
     """Cek apakah file yang diupload adalah gambar yang valid"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def detect_objects_background(image_path, job_id, filename, conf_threshold=0.5):
+def detect_objects_batch(jobs):
     """
-    Fungsi untuk menjalankan deteksi objek di background thread
+    Fungsi untuk menjalankan deteksi objek untuk satu batch job sekaligus
+    
+    Args:
+        jobs (list): List tuple (image, job_id, filename, conf_threshold, cache_key)
     """
-    try:
+    images = []
+    valid_jobs = []
+    
+    for image, job_id, filename, conf_threshold, cache_key in jobs:
         print(f"[{datetime.now()}] Memulai proses deteksi untuk {filename} (Job ID: {job_id[:8]}...)")
         
-        # Update status ke processing
-        detection_jobs[job_id]['status'] = 'processing'
-        
-        # Simulasi sedikit delay untuk demo
-        time.sleep(0.5)
+        try:
+            # Update status ke processing
+            job_store.update(job_id, {'status': 'processing'})
+        except Exception as e:
+            finish_job_with_error(job_id, filename, str(e))
+            continue
         
-        # Jalankan deteksi menggunakan YOLODetector class
-        detection_result = detector.detect_image(
-            image_path=image_path,
-            conf_threshold=conf_threshold,
+        images.append(image)
+        valid_jobs.append((job_id, filename, conf_threshold, cache_key))
+    
+    if not images:
+        return
+    
+    try:
+        # Jalankan deteksi satu forward pass untuk seluruh batch
+        batch_results = detector.detect_batch(
+            images=images,
+            conf_thresholds=[conf for _, _, conf, _ in valid_jobs],
             imgsz=640
         )
+    except Exception as e:
+        for job_id, filename, _, _ in valid_jobs:
+            finish_job_with_error(job_id, filename, str(e))
+        return
+    
+    for (job_id, filename, conf_threshold, cache_key), detection_result in zip(valid_jobs, batch_results):
+        # Kegagalan satu job tidak boleh membuat job lain di batch tertahan
+        try:
+            unique_labels = detection_result['unique_labels']
+            total_objects = detection_result['total_objects']
+            confidences = detection_result['confidences']
+            
+            print(f"[{datetime.now()}] Deteksi selesai untuk {filename}.")
+            print(f"[{datetime.now()}] Objek terdeteksi: {unique_labels} (Total: {total_objects})")
+            
+            result_data = {
+                'status': 'completed',
+                'results': unique_labels,
+                'total_objects': total_objects,
+                'unique_objects': len(unique_labels),
+                'all_labels': detection_result['labels'],
+                'confidences': confidences,
+                'avg_confidence': detection_result['avg_confidence'],
+                'detection_details': detection_result
+            }
+            
+            # Update hasil deteksi
+            job_store.update(job_id, {
+                **result_data,
+                'timestamp': datetime.now().isoformat(),
+                'filename': filename,
+                'confidence_threshold': conf_threshold
+            })
+        except Exception as e:
+            finish_job_with_error(job_id, filename, str(e))
+            continue
         
-        unique_labels = detection_result['unique_labels']
-        total_objects = detection_result['total_objects']
-        confidences = detection_result['confidences']
-        
-        print(f"[{datetime.now()}] Deteksi selesai untuk {filename}.")
-        print(f"[{datetime.now()}] Objek terdeteksi: {unique_labels} (Total: {total_objects})")
+        # Simpan ke cache untuk gambar yang sama, gagal cache tidak menggagalkan job
+        try:
+            job_store.cache_result(cache_key, result_data)
+        except Exception as e:
+            print(f"[{datetime.now()}] Gagal menyimpan cache hasil {filename}: {e}")
         
-        # Update hasil deteksi
-        detection_jobs[job_id] = {
-            'status': 'completed',
-            'results': unique_labels,
-            'timestamp': datetime.now(),
+        notify_job_done(job_id)
+
+def finish_job_with_error(job_id, filename, error):
+    """Tandai job sebagai error dan bangunkan yang menunggu hasilnya"""
+    print(f"[{datetime.now()}] Error dalam proses deteksi {filename}: {error}")
+    try:
+        job_store.update(job_id, {
+            'status': 'error',
+            'results': [],
+            'error': error,
+            'timestamp': datetime.now().isoformat(),
             'filename': filename,
-            'total_objects': total_objects,
-            'unique_objects': len(unique_labels),
-            'all_labels': detection_result['labels'],
-            'confidences': confidences,
-            'avg_confidence': sum(confidences) / len(confidences) if confidences else 0,
-            'detection_details': detection_result
-        }
+            'total_objects': 0,
+            'unique_objects': 0
+        })
+    except Exception as e:
+        print(f"[{datetime.now()}] Gagal menyimpan status error {filename}: {e}")
+    finally:
+        notify_job_done(job_id)
+
+def notify_job_done(job_id):
+    """Set event job (jika ada) lalu hapus dari job_events"""
+    done_event = job_events.pop(job_id, None)
+    if done_event is not None:
+        done_event.set()
+
+def detection_worker():
+    """
+    Worker tunggal yang mengambil job dari queue dan menggabungkannya
+    menjadi batch hingga MAX_BATCH gambar per inference
+    """
+    while True:
+        jobs = [detection_queue.get()]
+        while len(jobs) < MAX_BATCH:
+            try:
+                jobs.append(detection_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        try:
+            detect_objects_batch(jobs)
+        except Exception as e:
+            print(f"[{datetime.now()}] Error dalam detection worker: {e}")
+
+# Jalankan worker deteksi di background thread
+detection_thread = threading.Thread(target=detection_worker, name="yolo-batch", daemon=True)
+detection_thread.start()
+
+# Satu sesi webcam sekaligus: daemon thread agar tidak menahan proses saat shutdown,
+# dihentikan lewat webcam_stop_event (POST /api/webcam/stop)
+webcam_thread = None
+webcam_stop_event = threading.Event()
+webcam_lock = threading.Lock()  # cek is_alive lalu start harus atomic antar request
+
+def parse_conf_threshold(value):
+    """
+    Ambil confidence threshold dari request, fallback ke 0.5 jika tidak valid
+    Dibulatkan 2 desimal agar nilai filter sama dengan yang dipakai di cache key
+    """
+    try:
+        conf_threshold = float(value)
+    except (TypeError, ValueError):
+        return 0.5
+    if not (0.1 <= conf_threshold <= 1.0):
+        return 0.5
+    return round(conf_threshold, 2)
+
+def create_upload_path(original_filename):
+    """
+    Generate nama file yang aman beserta path tujuan di UPLOAD_FOLDER
+    Suffix acak mencegah dua upload dalam detik yang sama menimpa file yang sama
+    """
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{timestamp}_{uuid.uuid4().hex[:8]}_{secure_filename(original_filename)}"
+    return filename, os.path.join(UPLOAD_FOLDER, filename)
+
+def save_stream(stream, filepath):
+    """
+    Tulis stream ke disk per chunk sambil menghitung hash isinya (xxh3-128 jika tersedia),
+    sehingga file tidak perlu dibaca ulang untuk cache hasil deteksi
+    
+    Returns:
+        tuple: (file_size, content_hash)
+    """
+    hasher = new_hasher()
+    file_size = 0
+    with open(filepath, 'wb') as f:
+        while chunk := stream.read(UPLOAD_CHUNK_SIZE):
+            view = memoryview(chunk)
+            f.write(view)
+            hasher.update(view)
+            file_size += len(view)
+    return file_size, hasher.hexdigest()
+
+def load_upload_image(filepath):
+    """
+    Decode gambar upload, resize jika sisi terpanjang melebihi MAX_IMAGE_SIZE
+    lalu timpa file di disk dengan versi yang sudah di-resize
+    
+    Returns:
+        numpy.ndarray: Gambar BGR, None jika gagal dibaca
+    """
+    image = cv2.imread(filepath, cv2.IMREAD_COLOR)
+    if image is None:
+        return None
+    
+    h, w = image.shape[:2]
+    if max(h, w) > MAX_IMAGE_SIZE:
+        # Jaga aspect ratio, letterbox tetap dilakukan saat inference
+        scale = MAX_IMAGE_SIZE / max(h, w)
+        image = cv2.resize(image, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+        print(f"[{datetime.now()}] Gambar {w}x{h} di-resize ke {image.shape[1]}x{image.shape[0]}: {filepath}")
         
+        # Gagal menimpa file (format tanpa encoder, disk penuh) tidak menggagalkan deteksi
+        try:
+            if not cv2.imwrite(filepath, image):
+                print(f"[{datetime.now()}] Warning: Gagal menyimpan gambar hasil resize: {filepath}")
+        except (cv2.error, OSError) as e:
+            print(f"[{datetime.now()}] Warning: Gagal menyimpan gambar hasil resize {filepath}: {e}")
+    
+    return image
+
+def read_image_size(filepath):
+    """
+    Baca ukuran gambar dari header file tanpa decode pixel
+    
+    Returns:
+        tuple: (width, height), None jika header tidak bisa dibaca
+    """
+    try:
+        with Image.open(filepath) as img:
+            return img.size
+    except (OSError, ValueError):
+        return None
+
+def queue_detection_job(filepath, filename, conf_threshold, content_hash):
+    """
+    Daftarkan job baru dan masukkan ke queue deteksi
+    Jika gambar yang sama sudah pernah dideteksi, job langsung selesai dari cache
+    
+    Returns:
+        tuple: (job_id, cached)
+    
+    Raises:
+        queue.Full: Jika queue deteksi penuh, job ditandai error
+    """
+    # Generate job ID unik
+    job_id = str(uuid.uuid4())
+    
+    cache_key = f"det:{content_hash}:{conf_threshold:.2f}"
+    cached_result = job_store.get_cached_result(cache_key)
+    
+    if cached_result is not None:
+        # Cache hit tidak perlu decode, cukup cek ukuran dari header agar kontrak
+        # ukuran gambar di disk tetap berlaku; resize hanya jika melebihi batas
+        size = read_image_size(filepath)
+        if size is None or max(size) > MAX_IMAGE_SIZE:
+            try:
+                load_upload_image(filepath)
+            except Exception as e:
+                print(f"[{datetime.now()}] Warning: Gagal resize gambar {filepath}: {e}")
+        
+        job_store.create(job_id, {
+            **cached_result,
+            'timestamp': datetime.now().isoformat(),
+            'filename': filename,
+            'confidence_threshold': conf_threshold
+        })
+        print(f"[{datetime.now()}] Hasil deteksi untuk {filename} diambil dari cache (Job ID: {job_id[:8]}...)")
+        return job_id, True
+    
+    # Decode dan resize sebelum job dibuat, batch worker memakai gambar yang sudah di-decode
+    try:
+        image = load_upload_image(filepath)
+        error = None if image is not None else "Gagal membaca gambar"
     except Exception as e:
-        print(f"[{datetime.now()}] Error dalam proses deteksi {filename}: {e}")
-        detection_jobs[job_id] = {
+        image, error = None, f"Gagal memproses gambar: {e}"
+    
+    if error is not None:
+        print(f"[{datetime.now()}] Error dalam proses deteksi {filename}: {error}")
+        job_store.create(job_id, {
             'status': 'error',
             'results': [],
-            'error': str(e),
-            'timestamp': datetime.now(),
+            'error': error,
+            'timestamp': datetime.now().isoformat(),
             'filename': filename,
+            'confidence_threshold': conf_threshold,
             'total_objects': 0,
             'unique_objects': 0
-        }
+        })
+        return job_id, False
+    
+    # Inisialisasi job status
+    job_events[job_id] = threading.Event()
+    job_store.create(job_id, {
+        'status': 'queued',
+        'results': [],
+        'timestamp': datetime.now().isoformat(),
+        'filename': filename,
+        'confidence_threshold': conf_threshold
+    })
+    
+    # Masukkan ke queue deteksi, diproses oleh batch worker
+    try:
+        detection_queue.put_nowait((image, job_id, filename, conf_threshold, cache_key))
+    except queue.Full:
+        finish_job_with_error(job_id, filename, "Antrian deteksi penuh")
+        raise
+    
+    print(f"[{datetime.now()}] Job deteksi masuk queue untuk {filename} (Job ID: {job_id[:8]}...)")
+    return job_id, False
 
 @app.route('/api/upload', methods=['POST'])
 def upload_image():
     """
-    Endpoint untuk menerima upload gambar dari Raspberry Pi
+    Endpoint untuk menerima upload gambar dari Raspberry Pi (multipart/form-data)
+    Note: Untuk gambar besar gunakan PUT /api/upload_raw yang tidak melalui multipart parser
     """
     print(f"[{datetime.now()}] Menerima request upload dari {request.remote_addr}")
     
@@ -111,73 +441,132 @@ def upload_image():
             return jsonify({'error': 'Tidak ada file yang dipilih'}), 400
         
         # Get confidence threshold dari request (optional)
-        conf_threshold = float(request.form.get('confidence', 0.5))
-        if not (0.1 <= conf_threshold <= 1.0):
-            conf_threshold = 0.5
+        conf_threshold = parse_conf_threshold(request.form.get('confidence', 0.5))
         
         # Cek apakah file valid
         if file and allowed_file(file.filename):
-            # Generate job ID unik
-            job_id = str(uuid.uuid4())
-            
-            # Generate nama file yang aman
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            original_filename = secure_filename(file.filename)
-            filename = f"{timestamp}_{original_filename}"
-            filepath = os.path.join(UPLOAD_FOLDER, filename)
+            filename, filepath = create_upload_path(file.filename)
             
             # Simpan file
-            file.save(filepath)
+            _, content_hash = save_stream(file.stream, filepath)
             print(f"[{datetime.now()}] File berhasil disimpan: {filepath}")
             
-            # Inisialisasi job status
-            detection_jobs[job_id] = {
-                'status': 'queued',
-                'results': [],
-                'timestamp': datetime.now(),
-                'filename': filename,
-                'confidence_threshold': conf_threshold
-            }
-            
-            # Jalankan deteksi di background thread
-            detection_thread = threading.Thread(
-                target=detect_objects_background, 
-                args=(filepath, job_id, filename, conf_threshold)
-            )
-            detection_thread.daemon = True
-            detection_thread.start()
-            
-            print(f"[{datetime.now()}] Background thread deteksi dimulai untuk {filename} (Job ID: {job_id[:8]}...)")
+            try:
+                job_id, cached = queue_detection_job(filepath, filename, conf_threshold, content_hash)
+            except queue.Full:
+                return jsonify({'error': 'Server sibuk, antrian deteksi penuh'}), 503
             
             # Response dengan job_id
             return jsonify({
                 'status': 'success',
-                'message': 'File berhasil diupload, proses deteksi dimulai',
+                'message': 'File berhasil diupload, hasil deteksi dari cache' if cached else 'File berhasil diupload, proses deteksi dimulai',
                 'job_id': job_id,
                 'filename': filename,
-                'confidence_threshold': conf_threshold
+                'confidence_threshold': conf_threshold,
+                'cached': cached
             }), 200
             
         else:
             print(f"[{datetime.now()}] Error: Tipe file tidak diizinkan: {file.filename}")
             return jsonify({'error': 'Tipe file tidak diizinkan'}), 400
             
+    except RequestEntityTooLarge:
+        print(f"[{datetime.now()}] Error: Ukuran file melebihi {MAX_UPLOAD_SIZE} bytes")
+        return jsonify({'error': 'Ukuran file terlalu besar'}), 413
     except Exception as e:
         print(f"[{datetime.now()}] Error dalam upload_image: {e}")
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@app.route('/api/upload_raw', methods=['PUT'])
+def upload_image_raw():
+    """
+    Endpoint upload gambar dari Raspberry Pi tanpa multipart
+    Body request adalah isi file gambar, parameter lewat query string:
+        ?filename=capture.jpg&confidence=0.5
+    """
+    print(f"[{datetime.now()}] Menerima request upload raw dari {request.remote_addr}")
+    
+    try:
+        # Cek apakah detector siap
+        if detector.model is None:
+            return jsonify({'error': 'Model YOLOv8 tidak tersedia'}), 503
+        
+        original_filename = request.args.get('filename', 'image.jpg')
+        conf_threshold = parse_conf_threshold(request.args.get('confidence', 0.5))
+        
+        # Cek apakah file valid
+        if not allowed_file(original_filename):
+            print(f"[{datetime.now()}] Error: Tipe file tidak diizinkan: {original_filename}")
+            return jsonify({'error': 'Tipe file tidak diizinkan'}), 400
+        
+        # Tolak lebih awal jika Content-Length sudah melebihi batas
+        if request.content_length is not None and request.content_length > MAX_UPLOAD_SIZE:
+            print(f"[{datetime.now()}] Error: Ukuran file melebihi {MAX_UPLOAD_SIZE} bytes")
+            return jsonify({'error': 'Ukuran file terlalu besar'}), 413
+        
+        filename, filepath = create_upload_path(original_filename)
+        
+        # Stream body langsung ke disk
+        try:
+            file_size, content_hash = save_stream(request.stream, filepath)
+        except RequestEntityTooLarge:
+            # Body tanpa Content-Length (chunked) yang melebihi batas saat dibaca
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            print(f"[{datetime.now()}] Error: Ukuran file melebihi {MAX_UPLOAD_SIZE} bytes")
+            return jsonify({'error': 'Ukuran file terlalu besar'}), 413
+        
+        if file_size == 0:
+            os.remove(filepath)
+            print(f"[{datetime.now()}] Error: Body request kosong")
+            return jsonify({'error': 'Tidak ada data image'}), 400
+        print(f"[{datetime.now()}] File berhasil disimpan: {filepath}")
+        
+        try:
+            job_id, cached = queue_detection_job(filepath, filename, conf_threshold, content_hash)
+        except queue.Full:
+            return jsonify({'error': 'Server sibuk, antrian deteksi penuh'}), 503
+        
+        return jsonify({
+            'status': 'success',
+            'message': 'File berhasil diupload, hasil deteksi dari cache' if cached else 'File berhasil diupload, proses deteksi dimulai',
+            'job_id': job_id,
+            'filename': filename,
+            'confidence_threshold': conf_threshold,
+            'cached': cached
+        }), 200
+        
+    except Exception as e:
+        print(f"[{datetime.now()}] Error dalam upload_image_raw: {e}")
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
 @app.route('/api/result/<job_id>', methods=['GET'])
 def get_result(job_id):
     """
     Endpoint untuk mengecek hasil deteksi berdasarkan job_id
+    Long-poll: ?wait=<detik> menahan response sampai job selesai (maks MAX_RESULT_WAIT)
     """
     print(f"[{datetime.now()}] Request hasil untuk Job ID: {job_id[:8]}...")
     
-    if job_id not in detection_jobs:
+    wait = min(max(request.args.get('wait', 0, type=float), 0), MAX_RESULT_WAIT)
+    
+    # Ambil event sebelum membaca status: event di-set setelah hasil disimpan,
+    # jadi job yang selesai di antara keduanya tetap terbaca sebagai selesai
+    done_event = job_events.get(job_id)
+    
+    job_data = job_store.get(job_id)
+    if job_data is None:
         print(f"[{datetime.now()}] Job ID tidak ditemukan: {job_id[:8]}...")
         return jsonify({'error': 'Job ID tidak ditemukan'}), 404
     
-    job_data = detection_jobs[job_id]
+    # Tunggu job selesai jika masih aktif (event hanya ada di proses yang menerima upload)
+    if wait and done_event is not None and job_data['status'] in ('queued', 'processing'):
+        if long_poll_slots.acquire(blocking=False):
+            try:
+                if done_event.wait(timeout=wait):
+                    job_data = job_store.get(job_id) or job_data
+            finally:
+                long_poll_slots.release()
     
     # Prepare response
     response_data = {
@@ -185,7 +574,7 @@ def get_result(job_id):
         'status': job_data['status'],
         'hasil': job_data['results'],
         'filename': job_data['filename'],
-        'timestamp': job_data['timestamp'].isoformat(),
+        'timestamp': job_data['timestamp'],
         'total_objects': job_data.get('total_objects', 0),
         'unique_objects': job_data.get('unique_objects', 0),
         'confidence_threshold': job_data.get('confidence_threshold', 0.5)
@@ -207,34 +596,30 @@ def get_result(job_id):
 @app.route('/api/jobs', methods=['GET'])
 def list_jobs():
     """
-    Endpoint untuk melihat semua job yang ada
+    Endpoint untuk melihat job yang ada (paginated: ?limit=100&offset=0)
     """
-    jobs_summary = {}
-    active_jobs = 0
-    completed_jobs = 0
-    error_jobs = 0
+    limit = min(max(request.args.get('limit', DEFAULT_JOBS_LIMIT, type=int), 1), MAX_JOBS_LIMIT)
+    offset = max(request.args.get('offset', 0, type=int), 0)
     
-    for job_id, job_data in detection_jobs.items():
+    jobs_summary = {}
+    for job_id, job_data in job_store.items(offset=offset, limit=limit):
         jobs_summary[job_id] = {
             'status': job_data['status'],
             'filename': job_data['filename'],
-            'timestamp': job_data['timestamp'].isoformat(),
+            'timestamp': job_data['timestamp'],
             'total_objects': job_data.get('total_objects', 0)
         }
-        
-        # Count status
-        if job_data['status'] in ['queued', 'processing']:
-            active_jobs += 1
-        elif job_data['status'] == 'completed':
-            completed_jobs += 1
-        elif job_data['status'] == 'error':
-            error_jobs += 1
+    
+    # Count status dari counter job store, bukan dari halaman ini saja
+    status_counts = job_store.status_counts()
     
     return jsonify({
-        'total_jobs': len(detection_jobs),
-        'active_jobs': active_jobs,
-        'completed_jobs': completed_jobs,
-        'error_jobs': error_jobs,
+        'total_jobs': sum(status_counts.values()),
+        'active_jobs': status_counts['queued'] + status_counts['processing'],
+        'completed_jobs': status_counts['completed'],
+        'error_jobs': status_counts['error'],
+        'limit': limit,
+        'offset': offset,
         'jobs': jobs_summary
     }), 200
 
@@ -250,7 +635,7 @@ def get_model_info():
     return jsonify({
         'model_loaded': True,
         'model_info': model_info,
-        'supported_classes': list(model_info['model_names'].values()) if model_info else []
+        'supported_classes': detector.class_names
     }), 200
 
 @app.route('/health', methods=['GET'])
@@ -258,15 +643,16 @@ def health_check():
     """
     Endpoint untuk health check
     """
-    active_jobs = len([j for j in detection_jobs.values() if j['status'] in ['queued', 'processing']])
+    status_counts = job_store.status_counts()
     
     return jsonify({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat(),
+        'timestamp': datetime.now(),
         'model_loaded': detector.model is not None,
         'model_path': detector.model_path if detector.model else None,
-        'active_jobs': active_jobs,
-        'total_jobs': len(detection_jobs)
+        'active_jobs': status_counts['queued'] + status_counts['processing'],
+        'total_jobs': sum(status_counts.values()),
+        'job_store': 'redis' if REDIS_URL else 'memory'
     }), 200
 
 @app.route('/', methods=['GET'])
@@ -274,23 +660,23 @@ def home():
     """
     Endpoint root untuk info server
     """
-    model_info = detector.get_model_info() if detector.model else None
-    
     return jsonify({
         'message': 'Flask YOLOv8 Detection Server',
         'version': '2.0',
         'endpoints': {
-            '/api/upload': 'POST - Upload gambar untuk deteksi',
-            '/api/result/<job_id>': 'GET - Cek hasil deteksi',
-            '/api/jobs': 'GET - List semua job',
+            '/api/upload': 'POST - Upload gambar untuk deteksi (multipart)',
+            '/api/upload_raw': 'PUT - Upload gambar sebagai raw body (?filename=&confidence=), disarankan untuk Raspberry Pi',
+            '/api/result/<job_id>': 'GET - Cek hasil deteksi (?wait=10 untuk long-poll sampai selesai)',
+            '/api/jobs': 'GET - List job (?limit=100&offset=0)',
             '/api/model/info': 'GET - Info model',
             '/api/files': 'GET - List uploaded files',
             '/api/files/cleanup': 'POST - Cleanup old files',
             '/api/files/storage': 'GET - Storage information',
             '/health': 'GET - Health check',
         },
+        'image_contract': f'Kirim gambar JPEG maksimal {MAX_IMAGE_SIZE}x{MAX_IMAGE_SIZE} (resize di Raspberry Pi), gambar lebih besar akan di-resize di server',
         'model_status': 'loaded' if detector.model else 'not loaded',
-        'supported_classes': list(model_info['model_names'].values()) if model_info else [],
+        'supported_classes': detector.class_names,
         'model_path': detector.model_path
     })
 
@@ -302,16 +688,16 @@ def list_uploaded_files():
     try:
         files = []
         if os.path.exists(UPLOAD_FOLDER):
-            for filename in os.listdir(UPLOAD_FOLDER):
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                if os.path.isfile(filepath) and allowed_file(filename):
-                    file_stat = os.stat(filepath)
-                    files.append({
-                        'filename': filename,
-                        'size': file_stat.st_size,
-                        'created': datetime.fromtimestamp(file_stat.st_ctime).isoformat(),
-                        'modified': datetime.fromtimestamp(file_stat.st_mtime).isoformat()
-                    })
+            with os.scandir(UPLOAD_FOLDER) as entries:
+                for entry in entries:
+                    if entry.is_file() and allowed_file(entry.name):
+                        file_stat = entry.stat()
+                        files.append({
+                            'filename': entry.name,
+                            'size': file_stat.st_size,
+                            'created': datetime.fromtimestamp(file_stat.st_ctime),
+                            'modified': datetime.fromtimestamp(file_stat.st_mtime)
+                        })
         
         # Sort by creation time (newest first)
         files.sort(key=lambda x: x['created'], reverse=True)
@@ -336,13 +722,12 @@ def cleanup_old_files():
         
         deleted_files = []
         if os.path.exists(UPLOAD_FOLDER):
-            for filename in os.listdir(UPLOAD_FOLDER):
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                if os.path.isfile(filepath):
-                    if os.path.getctime(filepath) < cutoff_time:
-                        os.remove(filepath)
-                        deleted_files.append(filename)
-                        print(f"[{datetime.now()}] Deleted old file: {filename}")
+            with os.scandir(UPLOAD_FOLDER) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.stat().st_ctime < cutoff_time:
+                        os.remove(entry.path)
+                        deleted_files.append(entry.name)
+                        print(f"[{datetime.now()}] Deleted old file: {entry.name}")
         
         return jsonify({
             'status': 'success',
@@ -364,11 +749,11 @@ def get_storage_info():
         total_size = 0
         
         if os.path.exists(UPLOAD_FOLDER):
-            for filename in os.listdir(UPLOAD_FOLDER):
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                if os.path.isfile(filepath):
-                    total_files += 1
-                    total_size += os.path.getsize(filepath)
+            with os.scandir(UPLOAD_FOLDER) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        total_files += 1
+                        total_size += entry.stat().st_size
         
         # Get disk usage
         statvfs = os.statvfs(UPLOAD_FOLDER)
@@ -399,25 +784,49 @@ def start_webcam_detection():
     Note: Ini hanya untuk testing di server, biasanya tidak digunakan dalam production
     """
     try:
+        global webcam_thread
+        
         source = request.json.get('source', 0) if request.is_json else 0
         
-        # Jalankan dalam thread terpisah
-        webcam_thread = threading.Thread(
-            target=detector.webcam_detection,
-            args=(source,)
-        )
-        webcam_thread.daemon = True
-        webcam_thread.start()
+        with webcam_lock:
+            # Hanya satu sesi webcam sekaligus
+            if webcam_thread is not None and webcam_thread.is_alive():
+                return jsonify({'error': 'Webcam detection masih berjalan'}), 409
+            
+            # Jalankan dalam thread terpisah
+            webcam_stop_event.clear()
+            webcam_thread = threading.Thread(
+                target=detector.webcam_detection,
+                kwargs={'source': source, 'stop_event': webcam_stop_event},
+                name="webcam",
+                daemon=True
+            )
+            webcam_thread.start()
         
         return jsonify({
             'status': 'success',
             'message': f'Webcam detection dimulai dari source {source}',
-            'note': 'Tekan Ctrl+C di terminal server untuk menghentikan'
+            'note': 'Gunakan POST /api/webcam/stop untuk menghentikan'
         }), 200
         
     except Exception as e:
         return jsonify({'error': f'Error starting webcam: {str(e)}'}), 500
 
+@app.route('/api/webcam/stop', methods=['POST'])
+def stop_webcam_detection():
+    """
+    Endpoint untuk menghentikan deteksi webcam yang sedang berjalan
+    """
+    with webcam_lock:
+        if webcam_thread is None or not webcam_thread.is_alive():
+            return jsonify({'error': 'Tidak ada webcam detection yang berjalan'}), 409
+        
+        webcam_stop_event.set()
+    return jsonify({
+        'status': 'success',
+        'message': 'Webcam detection dihentikan'
+    }), 200
+
 if __name__ == '__main__':
     print(f"[{datetime.now()}] Starting Flask YOLOv8 Detection Server v2.0...")
     print(f"[{datetime.now()}] Upload folder: {UPLOAD_FOLDER}")
@@ -425,10 +834,13 @@ if __name__ == '__main__':
     
     if detector.model:
         model_info = detector.get_model_info()
-        print(f"[{datetime.now()}] Model classes: {list(model_info['model_names'].values())}")
+        print(f"[{datetime.now()}] Model classes: {detector.class_names}")
         print(f"[{datetime.now()}] Total classes: {model_info['num_classes']}")
     
     print(f"[{datetime.now()}] Server siap menerima request...")
+    print(f"[{datetime.now()}] Server development, untuk production gunakan:")
+    print(f"[{datetime.now()}]   gunicorn -c gunicorn_conf.py app:app")
     
-    # Jalankan server Flask
-    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
+    # Jalankan server Flask (debug hanya jika FLASK_DEBUG=1, tanpa reloader agar model tidak dimuat dua kali)
+    debug = os.environ.get('FLASK_DEBUG') == '1'
+    app.run(host='0.0.0.0', port=5000, debug=debug, use_reloader=False, threaded=True)
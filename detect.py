@@ -1,22 +1,119 @@
 from ultralytics import YOLO
 import cv2
+import json
+import numpy as np
 import os
+import threading
+import torch
 from datetime import datetime
 
+def get_export_path(model_path, device):
+    """Path hasil export di samping file .pt: .engine (GPU) atau .onnx (CPU)"""
+    export_format = 'engine' if device == 'cuda' else 'onnx'
+    return f"{os.path.splitext(model_path)[0]}.{export_format}"
+
+def export_model(model_path, max_batch=1, imgsz=640):
+    """
+    Export model .pt ke TensorRT engine (GPU) atau ONNX (CPU). Dijalankan sekali secara
+    terpisah (python detect.py --export), bukan saat server start, karena build TensorRT
+    bisa memakan waktu beberapa menit
+    
+    Metadata (max_batch dan mtime .pt) ditulis ke file .json setelah export selesai,
+    sehingga export yang terpotong atau sudah usang tidak akan dipakai
+    
+    Args:
+        model_path (str): Path ke model .pt
+        max_batch (int): Jumlah gambar maksimum per inference
+        imgsz (int): Image size untuk inference
+        
+    Returns:
+        str: Path hasil export
+    """
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    export_format = 'engine' if device == 'cuda' else 'onnx'
+    export_path = get_export_path(model_path, device)
+    
+    # Hapus metadata lama dulu agar export yang gagal di tengah jalan tidak dianggap valid
+    if os.path.exists(f"{export_path}.json"):
+        os.remove(f"{export_path}.json")
+    
+    print(f"[{datetime.now()}] Export model ke format {export_format}...")
+    exported_path = YOLO(model_path).export(
+        format=export_format,
+        imgsz=imgsz,
+        half=device == 'cuda',
+        batch=max_batch,
+        dynamic=True,  # batch dinamis hingga max_batch untuk batch worker
+        device=0 if device == 'cuda' else 'cpu'
+    )
+    exported_path = str(exported_path) if exported_path else export_path
+    
+    with open(f"{exported_path}.json", 'w') as f:
+        json.dump({
+            'max_batch': max_batch,
+            'imgsz': imgsz,
+            'source_mtime': os.path.getmtime(model_path)
+        }, f)
+    
+    print(f"[{datetime.now()}] Export selesai: {exported_path}")
+    return exported_path
+
+def find_exported_model(model_path, max_batch, device, imgsz=640):
+    """
+    Cari hasil export yang masih valid untuk model .pt
+    
+    Returns:
+        str: Path hasil export, None jika tidak ada atau sudah tidak cocok
+            (export terpotong, .pt berubah, max_batch atau imgsz berbeda)
+    """
+    export_path = get_export_path(model_path, device)
+    meta_path = f"{export_path}.json"
+    if not (os.path.exists(export_path) and os.path.exists(meta_path)):
+        return None
+    
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if (meta.get('source_mtime') != os.path.getmtime(model_path)
+            or os.path.getmtime(export_path) < os.path.getmtime(model_path)
+            or meta.get('max_batch', 0) < max_batch
+            or meta.get('imgsz') != imgsz):
+        print(f"[{datetime.now()}] Hasil export {export_path} sudah tidak cocok, jalankan ulang: python detect.py --export")
+        return None
+    
+    return export_path
+
 class YOLODetector:
     """
     Class untuk YOLOv8 Detection yang dapat digunakan untuk berbagai source
     """
     
-    def __init__(self, model_path="hasil_traning_botol_kaleng/botol_kaleng_model2/weights/best.pt"):
+    def __init__(self, model_path="hasil_traning_botol_kaleng/botol_kaleng_model2/weights/best.pt", max_batch=1, optimize=True):
         """
         Initialize YOLO detector
         
         Args:
             model_path (str): Path ke model weights
+            max_batch (int): Jumlah gambar maksimum per inference (untuk export engine)
+            optimize (bool): Pakai hasil export TensorRT (GPU) / ONNX (CPU) jika tersedia dan valid
         """
         self.model_path = model_path
+        self.weights_path = model_path
+        self.max_batch = max_batch
+        self.optimize = optimize
         self.model = None
+        self.names = {}
+        self.class_names = []
+        self._model_info = None
+        # Predictor Ultralytics tidak thread-safe: batch worker dan webcam bergantian memakainya
+        self._predict_lock = threading.Lock()
+        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.half = self.device == 'cuda'  # FP16 hanya di GPU
+        self.imgsz = 640  # imgsz yang dipakai saat export
+        
         self.load_model()
     
     def load_model(self):
@@ -25,14 +122,70 @@ class YOLODetector:
             if not os.path.exists(self.model_path):
                 raise FileNotFoundError(f"Model file tidak ditemukan: {self.model_path}")
             
-            self.model = YOLO(self.model_path)
-            print(f"[{datetime.now()}] Model YOLOv8 berhasil dimuat dari {self.model_path}")
+            self.weights_path = self.model_path
+            if self.optimize and self.model_path.endswith('.pt'):
+                self.weights_path = find_exported_model(self.model_path, self.max_batch, self.device, self.imgsz) or self.model_path
+            self.model = YOLO(self.weights_path, task='detect')
+            
+            # Nama class tidak berubah setelah model dimuat, simpan sekali saja
+            self.names = dict(self.model.names)
+            self.class_names = list(self.names.values())
+            self._model_info = {
+                'model_path': self.model_path,
+                'weights_path': self.weights_path,
+                'device': self.device,
+                'half': self.half,
+                'model_names': self.names,
+                'num_classes': len(self.names)
+            }
+            
+            # Hanya model PyTorch yang bisa dipindah device dan di-fuse
+            if self.weights_path.endswith('.pt'):
+                self.model.to(self.device)
+                self.model.fuse()
+            print(f"[{datetime.now()}] Model YOLOv8 berhasil dimuat dari {self.weights_path} (device: {self.device}, half: {self.half})")
+            
+            self.warmup()
             return True
         except Exception as e:
             print(f"[{datetime.now()}] Error loading model: {e}")
             self.model = None
+            self.class_names = []
+            self._model_info = None
             return False
     
+    def warmup(self, imgsz=640, runs=3):
+        """
+        Jalankan beberapa inference dummy agar inisialisasi CUDA/cuDNN autotune
+        tidak dibebankan ke request pertama
+        
+        Args:
+            imgsz (int): Image size untuk inference
+            runs (int): Jumlah inference dummy
+        """
+        dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self.model(dummy, imgsz=imgsz, device=self.device, half=self.half, verbose=False)
+        print(f"[{datetime.now()}] Warm-up model selesai ({runs}x)")
+    
+    def _extract_detections(self, result, conf_threshold):
+        """
+        Ambil label, confidence, dan bbox dari satu hasil inference dengan
+        satu kali transfer GPU->CPU untuk seluruh box
+        
+        Args:
+            result: Ultralytics Results untuk satu gambar
+            conf_threshold (float): Confidence threshold
+            
+        Returns:
+            tuple: (labels, confidences, boxes), confidences sebagai numpy array
+        """
+        data = result.boxes.data.cpu().numpy()  # [x1, y1, x2, y2, (track_id), conf, cls]
+        conf = data[:, -2]
+        mask = conf >= conf_threshold
+        labels = [self.names[class_id] for class_id in data[mask, -1].astype(np.int32)]
+        return labels, conf[mask], data[mask, :4].tolist()
+    
     def detect_image(self, image_path, conf_threshold=0.5, imgsz=640):
         """
         Detect objects dalam gambar
@@ -47,6 +200,7 @@ class YOLODetector:
                 {
                     'labels': ['botol', 'kaleng'],
                     'confidences': [0.85, 0.92],
+                    'avg_confidence': 0.885,
                     'boxes': [box1, box2],
                     'total_objects': 2,
                     'unique_labels': ['botol', 'kaleng']
@@ -65,40 +219,73 @@ class YOLODetector:
                 raise Exception("Gagal membaca gambar")
             
             # Inference
-            results = self.model(image, imgsz=imgsz, conf=conf_threshold)
+            with self._predict_lock:
+                results = self.model(image, imgsz=imgsz, conf=conf_threshold, device=self.device, half=self.half)
             
             # Extract informasi deteksi
-            detected_labels = []
-            confidences = []
-            boxes = []
-            
-            for result in results:
-                for box in result.boxes:
-                    if box.conf >= conf_threshold:
-                        class_id = int(box.cls)
-                        label = self.model.names[class_id]
-                        confidence = float(box.conf)
-                        bbox = box.xyxy[0].tolist()  # [x1, y1, x2, y2]
-                        
-                        detected_labels.append(label)
-                        confidences.append(confidence)
-                        boxes.append(bbox)
+            detected_labels, confidences, boxes = self._extract_detections(results[0], conf_threshold)
             
             # Get unique labels
-            unique_labels = list(set(detected_labels))
+            unique_labels = list(dict.fromkeys(detected_labels))
             
             return {
                 'labels': detected_labels,
-                'confidences': confidences,
+                'confidences': confidences.tolist(),
+                'avg_confidence': float(confidences.mean()) if confidences.size else 0.0,
                 'boxes': boxes,
                 'total_objects': len(detected_labels),
                 'unique_labels': unique_labels,
-                'model_names': dict(self.model.names)
+                'model_names': self.names
             }
             
         except Exception as e:
             raise Exception(f"Error dalam deteksi: {str(e)}")
     
+    def detect_batch(self, images, conf_thresholds, imgsz=640):
+        """
+        Detect objects dalam beberapa gambar sekaligus (satu forward pass)
+        
+        Args:
+            images (list): List OpenCV image (BGR)
+            conf_thresholds (list): Confidence threshold untuk tiap gambar
+            imgsz (int): Image size untuk inference
+            
+        Returns:
+            list: Hasil deteksi per gambar dengan format yang sama seperti detect_image
+        """
+        if self.model is None:
+            raise Exception("Model belum dimuat atau gagal dimuat")
+        
+        if not images:
+            return []
+        
+        try:
+            # Satu inference untuk seluruh batch, pakai threshold terendah
+            # lalu filter per gambar sesuai threshold masing-masing
+            with self._predict_lock:
+                results = self.model(images, imgsz=imgsz, conf=min(conf_thresholds), device=self.device, half=self.half)
+            
+            batch_results = []
+            for result, conf_threshold in zip(results, conf_thresholds):
+                detected_labels, confidences, boxes = self._extract_detections(result, conf_threshold)
+                
+                unique_labels = list(dict.fromkeys(detected_labels))
+                
+                batch_results.append({
+                    'labels': detected_labels,
+                    'confidences': confidences.tolist(),
+                    'avg_confidence': float(confidences.mean()) if confidences.size else 0.0,
+                    'boxes': boxes,
+                    'total_objects': len(detected_labels),
+                    'unique_labels': unique_labels,
+                    'model_names': self.names
+                })
+            
+            return batch_results
+            
+        except Exception as e:
+            raise Exception(f"Error dalam deteksi batch: {str(e)}")
+    
     def detect_frame(self, frame, conf_threshold=0.5, imgsz=640):
         """
         Detect objects dalam frame (untuk webcam/video)
@@ -116,33 +303,21 @@ class YOLODetector:
         
         try:
             # Inference
-            results = self.model(frame, imgsz=imgsz, conf=conf_threshold)
+            with self._predict_lock:
+                results = self.model(frame, imgsz=imgsz, conf=conf_threshold, device=self.device, half=self.half)
             
             # Get annotated frame
             annotated_frame = results[0].plot()
             
             # Extract informasi deteksi
-            detected_labels = []
-            confidences = []
-            boxes = []
-            
-            for result in results:
-                for box in result.boxes:
-                    if box.conf >= conf_threshold:
-                        class_id = int(box.cls)
-                        label = self.model.names[class_id]
-                        confidence = float(box.conf)
-                        bbox = box.xyxy[0].tolist()
-                        
-                        detected_labels.append(label)
-                        confidences.append(confidence)
-                        boxes.append(bbox)
-            
-            unique_labels = list(set(detected_labels))
+            detected_labels, confidences, boxes = self._extract_detections(results[0], conf_threshold)
+            
+            unique_labels = list(dict.fromkeys(detected_labels))
             
             detection_results = {
                 'labels': detected_labels,
-                'confidences': confidences,
+                'confidences': confidences.tolist(),
+                'avg_confidence': float(confidences.mean()) if confidences.size else 0.0,
                 'boxes': boxes,
                 'total_objects': len(detected_labels),
                 'unique_labels': unique_labels
@@ -153,13 +328,15 @@ class YOLODetector:
         except Exception as e:
             raise Exception(f"Error dalam deteksi frame: {str(e)}")
     
-    def webcam_detection(self, source=0, window_name="YOLOv8 Detection"):
+    def webcam_detection(self, source=0, window_name="YOLOv8 Detection", stop_event=None):
         """
         Real-time detection dari webcam (original functionality)
         
         Args:
             source: Camera source (0, 1, atau path ke video)
             window_name (str): Nama window untuk display
+            stop_event (threading.Event): Jika di-set, loop deteksi berhenti
+                (untuk server tanpa display di mana tombol 'q' tidak bisa ditekan)
         """
         if self.model is None:
             print("Error: Model belum dimuat")
@@ -174,7 +351,7 @@ class YOLODetector:
         print(f"[{datetime.now()}] Memulai deteksi webcam dari source {source}")
         print("Tekan 'q' untuk keluar")
         
-        while True:
+        while stop_event is None or not stop_event.is_set():
             ret, frame = cap.read()
             if not ret:
                 print("Error: Tidak dapat membaca frame")
@@ -205,18 +382,22 @@ class YOLODetector:
         print(f"\n[{datetime.now()}] Deteksi webcam dihentikan")
     
     def get_model_info(self):
-        """Get informasi model"""
-        if self.model is None:
-            return None
-        
-        return {
-            'model_path': self.model_path,
-            'model_names': dict(self.model.names),
-            'num_classes': len(self.model.names)
-        }
+        """Get informasi model (di-cache saat load_model)"""
+        return self._model_info
 
 # Untuk backward compatibility dengan kode lama
 if __name__ == "__main__":
-    # Original functionality
-    detector = YOLODetector()
-    detector.webcam_detection(source=1)
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="YOLOv8 Detector")
+    parser.add_argument('--export', action='store_true', help='Export model ke TensorRT (GPU) / ONNX (CPU) lalu keluar')
+    parser.add_argument('--model', default="hasil_traning_botol_kaleng/botol_kaleng_model2/weights/best.pt", help='Path ke model .pt')
+    parser.add_argument('--max-batch', type=int, default=8, help='Batch maksimum untuk export (samakan dengan MAX_BATCH di app.py)')
+    args = parser.parse_args()
+    
+    if args.export:
+        export_model(args.model, max_batch=args.max_batch)
+    else:
+        # Original functionality
+        detector = YOLODetector(args.model)
+        detector.webcam_detection(source=1)
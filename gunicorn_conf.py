@@ -0,0 +1,24 @@
+"""
+Konfigurasi Gunicorn untuk production
+
+Export model dilakukan terpisah sebelum start (python detect.py --export),
+lalu jalankan dengan:
+    gunicorn -c gunicorn_conf.py app:app
+
+Satu worker saja karena GPU dipakai serial oleh batch worker di app.py,
+request I/O (upload, cek hasil) ditangani oleh thread gthread.
+"""
+bind = '0.0.0.0:5000'
+workers = 1
+
+# Long-poll /api/result menahan satu thread hingga MAX_RESULT_WAIT (10 detik).
+# app.py membatasi long-poll bersamaan ke MAX_LONG_POLLS (4) agar sisa thread
+# tetap melayani upload dan /health; naikkan keduanya bersamaan jika perlu
+threads = 8
+worker_class = 'gthread'
+
+# Worker di-import sekali saat start: load model + warm-up 3x (CUDA init, cuDNN autotune)
+# bisa lebih dari 60 detik di GPU kecil. Export TensorRT tidak ikut dihitung karena
+# dijalankan offline, jika belum ada worker memakai .pt
+timeout = 180
+graceful_timeout = 30
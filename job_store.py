@@ -0,0 +1,215 @@
+import json
+import threading
+import time
+from collections import Counter, OrderedDict
+from itertools import islice
+
+# Status job yang mungkin
+JOB_STATUSES = ('queued', 'processing', 'completed', 'error')
+
+# Lama penyimpanan job di Redis (detik)
+JOB_TTL = 24 * 60 * 60
+
+# Jumlah job maksimum di memory, job paling lama dibuang jika penuh
+MAX_MEMORY_JOBS = 1024
+
+# Lama penyimpanan cache hasil deteksi (detik)
+RESULT_CACHE_TTL = 24 * 60 * 60
+
+# Jumlah hasil deteksi maksimum di cache memory
+RESULT_CACHE_SIZE = 256
+
+class MemoryJobStore:
+    """
+    Penyimpanan status job di memory proses (default, tanpa Redis),
+    dibatasi max_jobs dengan eviction LRU
+    """
+
+    def __init__(self, max_jobs=MAX_MEMORY_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs = {}  # urutan pembuatan, untuk pagination yang stabil
+        self._lru = OrderedDict()  # urutan akses terakhir, untuk eviction
+        self._results = OrderedDict()
+        self._status_counts = Counter()
+        self._lock = threading.Lock()
+
+    def create(self, job_id, data):
+        """Simpan job baru"""
+        with self._lock:
+            self._jobs[job_id] = dict(data)
+            self._lru[job_id] = None
+            self._status_counts[data.get('status')] += 1
+            if len(self._jobs) > self.max_jobs:
+                evicted_id, _ = self._lru.popitem(last=False)
+                evicted = self._jobs.pop(evicted_id)
+                self._status_counts[evicted.get('status')] -= 1
+
+    def update(self, job_id, data):
+        """Update sebagian field job, diabaikan jika job sudah dibuang"""
+        with self._lock:
+            job_data = self._jobs.get(job_id)
+            if job_data is None:
+                return
+            if 'status' in data:
+                self._status_counts[job_data.get('status')] -= 1
+                self._status_counts[data['status']] += 1
+            job_data.update(data)
+            self._lru.move_to_end(job_id)
+
+    def get(self, job_id):
+        """Ambil data job, None jika tidak ada"""
+        with self._lock:
+            job_data = self._jobs.get(job_id)
+            return dict(job_data) if job_data is not None else None
+
+    def items(self, offset=0, limit=None):
+        """Iterasi (job_id, job_data) terbaru lebih dulu, opsional dengan offset/limit"""
+        with self._lock:
+            stop = offset + limit if limit is not None else None
+            snapshot = [
+                (job_id, self._jobs[job_id])
+                for job_id in islice(reversed(self._jobs), offset, stop)
+            ]
+        for job_id, job_data in snapshot:
+            yield job_id, dict(job_data)
+
+    def status_counts(self):
+        """Jumlah job per status, dijaga saat create/update sehingga O(1)"""
+        with self._lock:
+            return {status: self._status_counts[status] for status in JOB_STATUSES}
+
+    def get_cached_result(self, cache_key):
+        """Ambil hasil deteksi dari cache, None jika tidak ada"""
+        with self._lock:
+            result = self._results.get(cache_key)
+            if result is None:
+                return None
+            self._results.move_to_end(cache_key)
+            return dict(result)
+
+    def cache_result(self, cache_key, result):
+        """Simpan hasil deteksi ke cache, buang yang paling lama jika penuh"""
+        with self._lock:
+            self._results[cache_key] = dict(result)
+            self._results.move_to_end(cache_key)
+            if len(self._results) > RESULT_CACHE_SIZE:
+                self._results.popitem(last=False)
+
+class RedisJobStore:
+    """
+    Penyimpanan status job di Redis (satu hash per job dengan TTL),
+    sehingga state bisa dibagi antar worker dan tidak hilang saat restart
+    """
+
+    def __init__(self, redis_url, ttl=JOB_TTL):
+        """
+        Args:
+            redis_url (str): URL koneksi Redis, misal redis://localhost:6379/0
+            ttl (int): Lama job disimpan dalam detik
+        """
+        import redis
+
+        self.ttl = ttl
+        self.redis = redis.Redis.from_url(redis_url, decode_responses=True)
+
+    @staticmethod
+    def _key(job_id):
+        return f"job:{job_id}"
+
+    # Sorted set job_id dengan score waktu pembuatan, untuk pagination
+    CREATED_KEY = "jobs:created"
+
+    @staticmethod
+    def _status_key(status):
+        return f"jobs:status:{status}"
+
+    @staticmethod
+    def _encode(data):
+        # Semua value disimpan sebagai JSON agar tipe (list, float, None) tetap utuh
+        return {field: json.dumps(value) for field, value in data.items()}
+
+    @staticmethod
+    def _decode(raw):
+        return {field: json.loads(value) for field, value in raw.items()}
+
+    def create(self, job_id, data):
+        """Simpan job baru"""
+        self.redis.zadd(self.CREATED_KEY, {job_id: time.time()})
+        self._write(job_id, data, old_status=None)
+
+    def update(self, job_id, data):
+        """Update sebagian field job dan perpanjang TTL, diabaikan jika job sudah expire"""
+        pipe = self.redis.pipeline()
+        pipe.exists(self._key(job_id))
+        pipe.hget(self._key(job_id), 'status')
+        exists, old_status = pipe.execute()
+
+        # HSET pada key yang sudah hilang akan membuat record tidak lengkap
+        if not exists:
+            return
+        self._write(job_id, data, old_status)
+
+    def _write(self, job_id, data, old_status):
+        """Tulis field job, perpanjang TTL, dan pindahkan job ke sorted set status baru"""
+        key = self._key(job_id)
+        new_status = data.get('status')
+
+        pipe = self.redis.pipeline()
+        pipe.hset(key, mapping=self._encode(data))
+        pipe.expire(key, self.ttl)
+
+        # Sorted set per status (score = waktu update) untuk hitung status tanpa SCAN
+        if new_status:
+            if old_status:
+                pipe.zrem(self._status_key(json.loads(old_status)), job_id)
+            pipe.zadd(self._status_key(new_status), {job_id: time.time()})
+        pipe.execute()
+
+    def get(self, job_id):
+        """Ambil data job, None jika tidak ada"""
+        raw = self.redis.hgetall(self._key(job_id))
+        return self._decode(raw) if raw else None
+
+    def items(self, offset=0, limit=None):
+        """Iterasi (job_id, job_data) terbaru lebih dulu, opsional dengan offset/limit"""
+        # Buang job yang sudah expire dari index sebelum mengambil halaman
+        self.redis.zremrangebyscore(self.CREATED_KEY, '-inf', time.time() - self.ttl)
+        end = offset + limit - 1 if limit is not None else -1
+        job_ids = self.redis.zrevrange(self.CREATED_KEY, offset, end)
+
+        pipe = self.redis.pipeline()
+        for job_id in job_ids:
+            pipe.hgetall(self._key(job_id))
+        for job_id, raw in zip(job_ids, pipe.execute()):
+            if raw:
+                yield job_id, self._decode(raw)
+
+    def status_counts(self):
+        """Jumlah job per status dari sorted set, job yang sudah expire dibuang dulu"""
+        cutoff = time.time() - self.ttl
+        pipe = self.redis.pipeline()
+        for status in JOB_STATUSES:
+            pipe.zremrangebyscore(self._status_key(status), '-inf', cutoff)
+            pipe.zcard(self._status_key(status))
+        replies = pipe.execute()
+        return {status: replies[i * 2 + 1] for i, status in enumerate(JOB_STATUSES)}
+
+    def get_cached_result(self, cache_key):
+        """Ambil hasil deteksi dari cache, None jika tidak ada"""
+        raw = self.redis.get(cache_key)
+        return json.loads(raw) if raw else None
+
+    def cache_result(self, cache_key, result):
+        """Simpan hasil deteksi ke cache dengan TTL"""
+        self.redis.setex(cache_key, RESULT_CACHE_TTL, json.dumps(result))
+
+def create_job_store(redis_url=None):
+    """
+    Buat job store sesuai konfigurasi
+
+    Args:
+        redis_url (str): URL Redis, jika kosong pakai penyimpanan di memory
+    """
+    if redis_url:
+        return RedisJobStore(redis_url)
+    return MemoryJobStore()